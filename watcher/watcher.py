@@ -5,35 +5,189 @@ CORRECTED VERSION with full debugging
 """
 
 import json
+import logging
 import os
+import queue
+import signal
+import sys
+import threading
 import time
+import traceback
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from collections import deque
 from datetime import datetime
-import subprocess
+from decimal import Decimal
+
+# orjson parses the raw bytes from os.read directly (no decode step);
+# stdlib json also accepts bytes and keeps the watcher usable without it
+try:
+    import orjson
+    _json_loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    _json_loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    # Package not installed: fall back to polling
+    INotify = None
 
 # ===== CONFIGURATION =====
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')
 ERROR_RATE_THRESHOLD = float(os.getenv('ERROR_RATE_THRESHOLD', 2))
 WINDOW_SIZE = int(os.getenv('WINDOW_SIZE', 200))
+if WINDOW_SIZE < 1:
+    # The window's eviction/full checks assume at least one slot
+    sys.exit(f"[FATAL ERROR] WINDOW_SIZE must be at least 1 (got {WINDOW_SIZE})")
 ALERT_COOLDOWN_SEC = int(os.getenv('ALERT_COOLDOWN_SEC', 300))
 MAINTENANCE_MODE = os.getenv('MAINTENANCE_MODE', 'false').lower() == 'true'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Per-line progress/cooldown chatter; off by default to keep stdout writes off the hot path
+VERBOSE = os.getenv('WATCHER_VERBOSE', 'false').lower() == 'true'
 
 LOG_FILE = '/var/log/nginx/access.log'
 EXPECTED_PRIMARY_POOL = 'blue'
 EXPECTED_BACKUP_POOL = 'green'
+# error_rate > ERROR_RATE_THRESHOLD  <=>  error_count >= this (window full)
+# Decimal of the configured value keeps it exact (1000 * 32.3 / 100 in float is 322.99999999999994)
+ERROR_COUNT_THRESHOLD = int(Decimal(repr(ERROR_RATE_THRESHOLD)) * WINDOW_SIZE // 100) + 1
+_PRIMARY_UPPER = EXPECTED_PRIMARY_POOL.upper()
+_BACKUP_UPPER = EXPECTED_BACKUP_POOL.upper()
+READ_CHUNK_SIZE = 1 << 16
+ALERT_QUEUE_SIZE = 64
+# Pending-type dedupe keeps at most one alert per type queued
+# (info, failover, recovery, error_rate), so a batch never exceeds this
+ALERT_BATCH_MAX = 4
+ALERT_FLUSH_TIMEOUT_SEC = 8  # stays inside docker stop's 10s grace period
+POLL_INTERVAL_SEC = 0.5
+LOG_WAIT_TIMEOUT_SEC = 60
+
+# ===== ALERT TEMPLATES =====
+# Built once at import; call sites only .format() the dynamic fields
+FAILOVER_TMPL = (
+    "*🚨 FAILOVER DETECTED*\n\n"
+    "*Event:* Primary pool has failed\n\n"
+    "*Pool Change:*\n"
+    "• *Primary Pool (was serving):* `{last_pool_upper}` ❌ DOWN\n"
+    "• *Backup Pool (now serving):* `{pool_upper}` ✅ ACTIVE\n"
+    "• *Release ID:* `{release}`\n"
+    "• *Upstream:* `{upstream_addr}`\n"
+    "• *Time:* `{timestamp}`\n\n"
+    "*What Happened:*\n"
+    "The primary pool (`{last_pool}`) failed health checks or returned errors. "
+    "Traffic automatically switched to backup pool (`{pool}`).\n\n"
+    "*Actions Required:*\n"
+    "1️⃣ Check primary container health:\n"
+    "   ```docker logs app_{last_pool} --tail 50```\n"
+    "2️⃣ Verify container status:\n"
+    "   ```docker ps | grep app_{last_pool}```\n"
+    "3️⃣ Investigate root cause\n"
+    "4️⃣ Fix issue and wait for automatic recovery"
+)
+
+RECOVERY_TMPL = (
+    "*✅ RECOVERY DETECTED*\n\n"
+    "*Event:* Primary pool has been restored\n\n"
+    "*Pool Change:*\n"
+    "• *Backup Pool (was serving):* `{last_pool_upper}`\n"
+    "• *Primary Pool (now serving):* `{pool_upper}` ✅ RESTORED\n"
+    "• *Release ID:* `{release}`\n"
+    "• *Upstream:* `{upstream_addr}`\n"
+    "• *Time:* `{timestamp}`\n\n"
+    "*What Happened:*\n"
+    "The primary pool (`{pool}`) has recovered and passed health checks. "
+    "Traffic automatically returned to the primary pool.\n\n"
+    "*Post-Recovery Actions:*\n"
+    "1️⃣ Monitor primary pool stability:\n"
+    "   ```docker logs app_{pool} --tail 50```\n"
+    "2️⃣ Verify no errors for next 15 minutes\n"
+    "3️⃣ Document the incident and root cause\n\n"
+    "*Status:* ✅ System operating normally"
+)
+
+ERROR_RATE_TMPL = (
+    "*⚠️ HIGH ERROR RATE DETECTED*\n\n"
+    "*Metrics:*\n"
+    "• *Error Rate:* `{error_rate:.2f}%` (Threshold: `{threshold}%`) 🔴\n"
+    "• *Errors:* `{error_count}` out of `{window_size}` requests\n"
+    "• *Current Pool:* `{pool_upper}`\n"
+    "• *Release ID:* `{release}`\n"
+    "• *Time:* `{timestamp}`\n\n"
+    "*What This Means:*\n"
+    "The application is experiencing elevated error rates. "
+    "This may indicate bugs, resource exhaustion, or infrastructure problems.\n\n"
+    "*Immediate Actions:*\n"
+    "1️⃣ Check application logs:\n"
+    "   ```docker logs app_{pool} --tail 100```\n"
+    "2️⃣ Check resource usage:\n"
+    "   ```docker stats app_{pool} --no-stream```\n"
+    "3️⃣ Review recent deployments or changes\n"
+    "4️⃣ Consider manual pool toggle if errors persist\n"
+    "5️⃣ Escalate if unresolved in 15 minutes"
+)
+
+STARTUP_TMPL = (
+    "*🟢 Alert Watcher Started*\n\n"
+    "*Configuration:*\n"
+    "• Monitoring: `{filepath}`\n"
+    "• Error Threshold: `{threshold}%`\n"
+    "• Window Size: `{window_size}` requests\n"
+    "• Cooldown: `{cooldown}s`\n"
+    "• Primary Pool: `{primary_upper}`\n"
+    "• Backup Pool: `{backup_upper}`\n\n"
+    "*Status:* Monitoring active and ready to detect failovers"
+)
+
+# ===== LOGGING =====
+# Debug output goes through logging so %-style args are only formatted when enabled
+logging.basicConfig(stream=sys.stdout, format='[%(levelname)s] %(message)s')
+logger = logging.getLogger('watcher')
+logger.setLevel(LOG_LEVEL)
+
+# ===== SLACK HTTP SESSION =====
+# One keep-alive connection reused for every webhook POST (no TLS handshake per alert)
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=2,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(['POST']),
+        raise_on_status=False
+    )
+))
 
 # ===== STATE =====
 last_seen_pool = None
-request_window = deque(maxlen=WINDOW_SIZE)
+# Only the error bit is ever read, so the window holds bare bools (True/False singletons)
+error_flags = deque(maxlen=WINDOW_SIZE)
+error_count = 0  # running count of True entries in error_flags
+# Cooldown bookkeeping uses time.monotonic() (immune to NTP/wall-clock jumps)
 last_alert_times = {
     'failover': None,
     'recovery': None,
     'error_rate': None
 }
+# Alerts are handed to a background sender so Slack RTT never stalls log ingest
+_alert_queue = queue.Queue(maxsize=ALERT_QUEUE_SIZE)
+# Types queued but not yet sent. Cooldown is only stamped once Slack accepts
+# an alert, so without this a burst would queue one copy per log line.
+# The lock makes the producer's cooldown+pending check atomic with the
+# sender's stamp+clear.
+_pending_alert_types = set()
+_alert_state_lock = threading.Lock()
 
-def send_slack_alert(message, alert_type='info', emoji='ℹ️'):
-    """Send formatted alert to Slack with debugging"""
+def send_slack_alert(message, alert_type='info', emoji='ℹ️', **fields):
+    """
+    Queue alert for the background Slack sender (never blocks on network I/O)
+    With fields, message is a template only formatted once the alert passes cooldown
+    """
     if MAINTENANCE_MODE:
         print(f"[MAINTENANCE MODE] Suppressed {alert_type} alert")
         return
@@ -42,275 +196,413 @@ def send_slack_alert(message, alert_type='info', emoji='ℹ️'):
         print("[ERROR] SLACK_WEBHOOK_URL not configured!")
         return
     
-    # Check cooldown
-    if last_alert_times.get(alert_type):
-        elapsed = (datetime.now() - last_alert_times[alert_type]).total_seconds()
-        if elapsed < ALERT_COOLDOWN_SEC:
-            print(f"[COOLDOWN] Skipping {alert_type} alert (sent {int(elapsed)}s ago)")
+    with _alert_state_lock:
+        # Check cooldown
+        last_sent = last_alert_times.get(alert_type)
+        if last_sent is not None:
+            elapsed = time.monotonic() - last_sent
+            if elapsed < ALERT_COOLDOWN_SEC:
+                if VERBOSE:
+                    print(f"[COOLDOWN] Skipping {alert_type} alert (sent {int(elapsed)}s ago)")
+                return
+        
+        if alert_type in _pending_alert_types:
+            if VERBOSE:
+                print(f"[COOLDOWN] Skipping {alert_type} alert (already queued)")
             return
+        _pending_alert_types.add(alert_type)
+    
+    if fields:
+        message = message.format(**fields)
+    
+    try:
+        _alert_queue.put_nowait((message, alert_type, emoji))
+    except queue.Full:
+        with _alert_state_lock:
+            _pending_alert_types.discard(alert_type)
+        logger.warning("Alert queue full, dropping %s alert", alert_type)
+
+def _send_slack_sync(batch):
+    """
+    Send one or more queued (message, alert_type, emoji) alerts to Slack
+    as a single webhook POST (runs on the sender thread)
+    Returns True when Slack accepted the message
+    """
+    label = ', '.join(alert_type for _, alert_type, _ in batch)
     
     # Simple payload for reliability
+    body = "\n---\n".join(
+        f"{emoji} *{alert_type.upper()} ALERT*\n\n{message}"
+        for message, alert_type, emoji in batch
+    )
     payload = {
-        "text": f"{emoji} *{alert_type.upper()} ALERT*\n\n{message}\n\n_Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}_"
+        "text": f"{body}\n\n_Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}_"
     }
     
-    print(f"[DEBUG] Sending {alert_type} alert to Slack...")
-    print(f"[DEBUG] Webhook: {SLACK_WEBHOOK_URL[:50]}...")
+    logger.debug("Sending %s alert to Slack...", label)
+    logger.debug("Webhook: %s...", SLACK_WEBHOOK_URL[:50])
     
     try:
-        response = requests.post(SLACK_WEBHOOK_URL, json=payload, timeout=10)
+        response = _session.post(SLACK_WEBHOOK_URL, json=payload, timeout=10)
         
-        print(f"[DEBUG] Response Status: {response.status_code}")
-        print(f"[DEBUG] Response Text: {response.text}")
+        logger.debug("Response Status: %s", response.status_code)
+        logger.debug("Response Text: %s", response.text)
         
         if response.status_code == 200:
-            print(f"[✓ ALERT SENT] {alert_type} alert successfully sent!")
-            last_alert_times[alert_type] = datetime.now()
-        else:
-            print(f"[✗ SLACK ERROR] Status {response.status_code}: {response.text}")
+            print(f"[✓ ALERT SENT] {label} alert successfully sent!")
+            return True
+        print(f"[✗ SLACK ERROR] Status {response.status_code}: {response.text}")
     except Exception as e:
         print(f"[✗ ERROR] Failed to send alert: {e}")
-        import traceback
         traceback.print_exc()
+    return False
+
+def _sender_loop():
+    """
+    Drain the alert queue forever. Alerts of different types that queued
+    up while the previous POST was in flight go out as one Slack message;
+    a lone alert is sent immediately (no batching wait)
+    """
+    while True:
+        batch = [_alert_queue.get()]
+        while len(batch) < ALERT_BATCH_MAX:
+            try:
+                batch.append(_alert_queue.get_nowait())
+            except queue.Empty:
+                break
+        sent = False
+        try:
+            sent = _send_slack_sync(batch)
+        finally:
+            # Stamp cooldown (on success) and clear pending in one step; a
+            # failed send may be queued again by the next event
+            with _alert_state_lock:
+                sent_at = time.monotonic()
+                for _, alert_type, _ in batch:
+                    if sent:
+                        last_alert_times[alert_type] = sent_at
+                    _pending_alert_types.discard(alert_type)
+            for _ in batch:
+                _alert_queue.task_done()
+
+def start_alert_sender():
+    """Start the daemon thread that delivers queued alerts"""
+    sender = threading.Thread(target=_sender_loop, name='slack-sender', daemon=True)
+    sender.start()
+    return sender
+
+def flush_alert_queue(timeout=ALERT_FLUSH_TIMEOUT_SEC):
+    """Wait (bounded) until every queued alert has been handed to Slack"""
+    with _alert_queue.all_tasks_done:
+        return _alert_queue.all_tasks_done.wait_for(
+            lambda: not _alert_queue.unfinished_tasks, timeout
+        )
+
+def handle_sigterm(signum, frame):
+    """Unwind main() so it flushes queued alerts outside signal context"""
+    # Only raise here: the interrupted code may hold Queue.mutex (put_nowait)
+    # or the stdout buffer, and neither is reentrant
+    raise SystemExit(0)
 
 def calculate_error_rate():
     """Calculate error percentage"""
-    if len(request_window) == 0:
+    if len(error_flags) == 0:
         return 0.0
-    error_count = sum(1 for req in request_window if req.get('is_error', False))
-    return (error_count / len(request_window)) * 100
+    return (error_count / len(error_flags)) * 100
+
+# Every 5xx code as str (nginx "upstream_status" is always a quoted string)
+_ERROR_CODES = frozenset(str(i) for i in range(500, 600))
 
 def is_error_status(status):
-    """Check if status is 5xx error"""
-    try:
-        status_int = int(status)
-        return 500 <= status_int < 600
-    except (ValueError, TypeError):
-        return False
+    """
+    Check if a non-int status is a 5xx error
+    Ints are range-checked inline in process_log_entry; only str can match
+    """
+    return isinstance(status, str) and status in _ERROR_CODES
 
 def parse_log_line(line):
-    """Parse JSON log line"""
+    """Parse JSON log line (raw bytes, no decode/strip needed)"""
+    try:
+        return _json_loads(line)
+    except JSONDecodeError:
+        return None
+
+def _watch_log_dir(filepath):
+    """
+    INotify watching the log's directory for (re)creation, or None to poll
+    INotify() loads libc and fails with EMFILE past fs.inotify.max_user_instances;
+    add_watch fails with ENOSPC past max_user_watches (or ENOENT, no directory yet)
+    """
+    if INotify is None:
+        return None
     try:
-        return json.loads(line.strip())
-    except json.JSONDecodeError:
+        inotify = INotify()
+    except OSError:
         return None
+    try:
+        inotify.add_watch(os.path.dirname(filepath) or '.',
+                          inotify_flags.CREATE | inotify_flags.MOVED_TO)
+    except OSError:
+        inotify.close()
+        return None
+    return inotify
+
+def wait_for_log_file(filepath, timeout=LOG_WAIT_TIMEOUT_SEC):
+    """
+    Block until filepath exists, woken by inotify the moment nginx creates it
+    Falls back to polling every 2s without inotify; returns False on timeout
+    """
+    if os.path.exists(filepath):
+        return True
+    print(f"[WAITING] Log file not found: {filepath}")
+    
+    inotify = _watch_log_dir(filepath)
+    
+    deadline = time.monotonic() + timeout
+    try:
+        # Re-check after the watch is armed so a create in between isn't missed
+        while not os.path.exists(filepath):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if inotify is not None:
+                inotify.read(timeout=int(remaining * 1000))
+            else:
+                time.sleep(min(2, remaining))
+        return True
+    finally:
+        if inotify is not None:
+            inotify.close()
+
+def open_log_file(filepath, inotify=None, from_end=False):
+    """Open log file for non-blocking reads and (re)register its inotify watch"""
+    fd = os.open(filepath, os.O_RDONLY | os.O_NONBLOCK)
+    if from_end:
+        os.lseek(fd, 0, os.SEEK_END)
+    wd = None
+    if inotify is not None:
+        wd = inotify.add_watch(filepath, inotify_flags.MODIFY | inotify_flags.MOVE_SELF)
+    return fd, wd
+
+def follow_log_file(filepath):
+    """
+    Follow log file like 'tail -F -n 0', yielding complete lines as bytes
+    Sleeps on inotify until nginx appends, reopens on rotation/truncation
+    """
+    inotify = _watch_log_dir(filepath)
+    if inotify is None and INotify is not None:
+        print(f"[WARNING] inotify unavailable, polling every {POLL_INTERVAL_SEC}s...")
+    
+    fd, wd = open_log_file(filepath, inotify, from_end=True)
+    carry = b''
+    try:
+        while True:
+            data = os.read(fd, READ_CHUNK_SIZE)
+            if data:
+                lines = data.split(b'\n')
+                lines[0] = carry + lines[0]
+                carry = lines.pop()
+                for line in lines:
+                    if line:
+                        yield line
+                continue
+            
+            # Drained to EOF - check for rotation/truncation before sleeping
+            try:
+                current_inode = os.stat(filepath).st_ino
+            except FileNotFoundError:
+                current_inode = None
+            if current_inode is not None and current_inode != os.fstat(fd).st_ino:
+                print("[INFO] Log file rotated, reopening...")
+                os.close(fd)
+                if wd is not None:
+                    try:
+                        inotify.rm_watch(wd)
+                    except OSError:
+                        pass
+                fd, wd = open_log_file(filepath, inotify)
+                carry = b''
+                continue
+            if os.fstat(fd).st_size < os.lseek(fd, 0, os.SEEK_CUR):
+                print("[INFO] Log file truncated, rewinding...")
+                os.lseek(fd, 0, os.SEEK_SET)
+                carry = b''
+                continue
+            
+            if inotify is not None:
+                inotify.read()
+            else:
+                time.sleep(POLL_INTERVAL_SEC)
+    finally:
+        os.close(fd)
+        if inotify is not None:
+            inotify.close()
+
+# Placeholders nginx writes when the upstream sent no X-App-Pool header
+# ('' and JSON null are already caught by the falsy check)
+_BAD_POOLS = frozenset(('-', 'null'))
+
+def _extract(entry):
+    """
+    Pull the fields we use out of a log entry in one tuple
+    The fallback timestamp is only built when the entry lacks one
+    """
+    get = entry.get  # bind once instead of six attribute lookups
+    return (
+        get('pool', ''),
+        get('release', ''),
+        get('status', 0),
+        get('upstream_status', ''),
+        get('timestamp') or datetime.now().isoformat(),
+        get('upstream_addr', 'unknown'),
+    )
 
 def process_log_entry(entry):
     """Process log entry and trigger alerts"""
-    global last_seen_pool
+    global last_seen_pool, error_count
     
     # Extract fields
-    pool = entry.get('pool', '')
-    release = entry.get('release', '')
-    status = entry.get('status', 0)
-    upstream_status = entry.get('upstream_status', '')
-    timestamp = entry.get('timestamp', datetime.now().isoformat())
-    upstream_addr = entry.get('upstream_addr', 'unknown')
+    pool, release, status, upstream_status, timestamp, upstream_addr = _extract(entry)
     
     # DEBUG: Show what we're processing
-    print(f"[DEBUG] Processing entry: pool='{pool}', status={status}, last_pool='{last_seen_pool}'")
+    logger.debug("Processing entry: pool='%s', status=%s, last_pool='%s'", pool, status, last_seen_pool)
     
     # Skip invalid entries
-    if not pool or pool == '-' or pool == 'null' or pool == '':
-        print(f"[DEBUG] SKIPPED - Invalid pool value: '{pool}'")
+    if not pool or not isinstance(pool, str) or pool in _BAD_POOLS:
+        logger.debug("SKIPPED - Invalid pool value: '%s'", pool)
         return
     
-    # Determine if error
-    is_error = is_error_status(status)
-    if upstream_status:
-        for us in str(upstream_status).split(','):
-            if is_error_status(us.strip()):
-                is_error = True
-                break
+    # Determine if error (nginx's numeric status is compared inline, no call)
+    is_error = 500 <= status < 600 if isinstance(status, int) else is_error_status(status)
+    # upstream_status is always a quoted string in our log_format; it only
+    # holds several comma-separated codes when nginx retried another upstream.
+    # Anything else is a malformed line and must not crash the watcher
+    if upstream_status and not is_error and isinstance(upstream_status, str):
+        if ',' in upstream_status:
+            is_error = any(us.strip() in _ERROR_CODES for us in upstream_status.split(','))
+        else:
+            is_error = upstream_status in _ERROR_CODES
     
     if is_error:
-        print(f"[DEBUG] ERROR DETECTED - Status: {status}, Upstream: {upstream_status}")
+        logger.debug("ERROR DETECTED - Status: %s, Upstream: %s", status, upstream_status)
     
     # Add to window
-    request_window.append({
-        'pool': pool,
-        'status': status,
-        'is_error': is_error,
-        'timestamp': timestamp
-    })
+    evicted = len(error_flags) == WINDOW_SIZE and error_flags[0]
+    error_flags.append(is_error)
+    error_count += is_error - evicted
     
-    print(f"[DEBUG] Window size: {len(request_window)}, Errors: {sum(1 for r in request_window if r.get('is_error'))}")
+    logger.debug("Window size: %d, Errors: %d", len(error_flags), error_count)
     
     # ===== FAILOVER DETECTION =====
     if last_seen_pool and last_seen_pool != pool:
-        print(f"[DEBUG] ⚠️  POOL CHANGE DETECTED! '{last_seen_pool}' -> '{pool}'")
+        logger.debug("⚠️  POOL CHANGE DETECTED! '%s' -> '%s'", last_seen_pool, pool)
         
         if last_seen_pool == EXPECTED_PRIMARY_POOL and pool == EXPECTED_BACKUP_POOL:
-            print(f"[DEBUG] ✓ FAILOVER CONDITION MET! {EXPECTED_PRIMARY_POOL} -> {EXPECTED_BACKUP_POOL}")
+            logger.debug("✓ FAILOVER CONDITION MET! %s -> %s", EXPECTED_PRIMARY_POOL, EXPECTED_BACKUP_POOL)
             
             # FAILOVER: Blue → Green
-            message = (
-                f"*🚨 FAILOVER DETECTED*\n\n"
-                f"*Event:* Primary pool has failed\n\n"
-                f"*Pool Change:*\n"
-                f"• *Primary Pool (was serving):* `{last_seen_pool.upper()}` ❌ DOWN\n"
-                f"• *Backup Pool (now serving):* `{pool.upper()}` ✅ ACTIVE\n"
-                f"• *Release ID:* `{release}`\n"
-                f"• *Upstream:* `{upstream_addr}`\n"
-                f"• *Time:* `{timestamp}`\n\n"
-                f"*What Happened:*\n"
-                f"The primary pool (`{last_seen_pool}`) failed health checks or returned errors. "
-                f"Traffic automatically switched to backup pool (`{pool}`).\n\n"
-                f"*Actions Required:*\n"
-                f"1️⃣ Check primary container health:\n"
-                f"   ```docker logs app_{last_seen_pool} --tail 50```\n"
-                f"2️⃣ Verify container status:\n"
-                f"   ```docker ps | grep app_{last_seen_pool}```\n"
-                f"3️⃣ Investigate root cause\n"
-                f"4️⃣ Fix issue and wait for automatic recovery"
+            send_slack_alert(
+                FAILOVER_TMPL, alert_type='failover', emoji='🚨',
+                last_pool=last_seen_pool, last_pool_upper=_PRIMARY_UPPER,
+                pool=pool, pool_upper=_BACKUP_UPPER,
+                release=release, upstream_addr=upstream_addr, timestamp=timestamp
             )
-            send_slack_alert(message, alert_type='failover', emoji='🚨')
         
         elif last_seen_pool == EXPECTED_BACKUP_POOL and pool == EXPECTED_PRIMARY_POOL:
-            print(f"[DEBUG] ✓ RECOVERY CONDITION MET! {EXPECTED_BACKUP_POOL} -> {EXPECTED_PRIMARY_POOL}")
+            logger.debug("✓ RECOVERY CONDITION MET! %s -> %s", EXPECTED_BACKUP_POOL, EXPECTED_PRIMARY_POOL)
             
             # RECOVERY: Green → Blue
-            message = (
-                f"*✅ RECOVERY DETECTED*\n\n"
-                f"*Event:* Primary pool has been restored\n\n"
-                f"*Pool Change:*\n"
-                f"• *Backup Pool (was serving):* `{last_seen_pool.upper()}`\n"
-                f"• *Primary Pool (now serving):* `{pool.upper()}` ✅ RESTORED\n"
-                f"• *Release ID:* `{release}`\n"
-                f"• *Upstream:* `{upstream_addr}`\n"
-                f"• *Time:* `{timestamp}`\n\n"
-                f"*What Happened:*\n"
-                f"The primary pool (`{pool}`) has recovered and passed health checks. "
-                f"Traffic automatically returned to the primary pool.\n\n"
-                f"*Post-Recovery Actions:*\n"
-                f"1️⃣ Monitor primary pool stability:\n"
-                f"   ```docker logs app_{pool} --tail 50```\n"
-                f"2️⃣ Verify no errors for next 15 minutes\n"
-                f"3️⃣ Document the incident and root cause\n\n"
-                f"*Status:* ✅ System operating normally"
+            send_slack_alert(
+                RECOVERY_TMPL, alert_type='recovery', emoji='✅',
+                last_pool_upper=_BACKUP_UPPER,
+                pool=pool, pool_upper=_PRIMARY_UPPER,
+                release=release, upstream_addr=upstream_addr, timestamp=timestamp
             )
-            send_slack_alert(message, alert_type='recovery', emoji='✅')
         else:
-            print(f"[DEBUG] Pool change but not failover/recovery: {last_seen_pool} -> {pool}")
+            logger.debug("Pool change but not failover/recovery: %s -> %s", last_seen_pool, pool)
     
     # Update last seen pool
     last_seen_pool = pool
     
     # ===== ERROR RATE DETECTION =====
-    if len(request_window) >= WINDOW_SIZE:
+    # Pure integer compare per line; the percentage is only computed to alert
+    if len(error_flags) == WINDOW_SIZE and error_count >= ERROR_COUNT_THRESHOLD:
         error_rate = calculate_error_rate()
         
-        print(f"[DEBUG] Error rate check: {error_rate:.2f}% (threshold: {ERROR_RATE_THRESHOLD}%)")
+        logger.debug("✓ ERROR RATE THRESHOLD EXCEEDED! %.2f%% > %s%%", error_rate, ERROR_RATE_THRESHOLD)
         
-        if error_rate > ERROR_RATE_THRESHOLD:
-            error_count = sum(1 for req in request_window if req.get('is_error', False))
-            
-            print(f"[DEBUG] ✓ ERROR RATE THRESHOLD EXCEEDED! {error_rate:.2f}% > {ERROR_RATE_THRESHOLD}%")
-            
-            message = (
-                f"*⚠️ HIGH ERROR RATE DETECTED*\n\n"
-                f"*Metrics:*\n"
-                f"• *Error Rate:* `{error_rate:.2f}%` (Threshold: `{ERROR_RATE_THRESHOLD}%`) 🔴\n"
-                f"• *Errors:* `{error_count}` out of `{WINDOW_SIZE}` requests\n"
-                f"• *Current Pool:* `{pool.upper()}`\n"
-                f"• *Release ID:* `{release}`\n"
-                f"• *Time:* `{timestamp}`\n\n"
-                f"*What This Means:*\n"
-                f"The application is experiencing elevated error rates. "
-                f"This may indicate bugs, resource exhaustion, or infrastructure problems.\n\n"
-                f"*Immediate Actions:*\n"
-                f"1️⃣ Check application logs:\n"
-                f"   ```docker logs app_{pool} --tail 100```\n"
-                f"2️⃣ Check resource usage:\n"
-                f"   ```docker stats app_{pool} --no-stream```\n"
-                f"3️⃣ Review recent deployments or changes\n"
-                f"4️⃣ Consider manual pool toggle if errors persist\n"
-                f"5️⃣ Escalate if unresolved in 15 minutes"
-            )
-            send_slack_alert(message, alert_type='error_rate', emoji='⚠️')
+        send_slack_alert(
+            ERROR_RATE_TMPL, alert_type='error_rate', emoji='⚠️',
+            error_rate=error_rate, threshold=ERROR_RATE_THRESHOLD,
+            error_count=error_count, window_size=WINDOW_SIZE,
+            pool=pool, pool_upper=pool.upper(),
+            release=release, timestamp=timestamp
+        )
 
-def tail_log_file_with_subprocess(filepath):
+def tail_log_file(filepath):
     """
-    Tail log file using subprocess (works with Docker volumes)
-    This avoids the 'not seekable' error
+    Tail log file directly with os.read, woken by inotify (works with Docker volumes)
+    No 'tail' subprocess, no pipe copy, no polling latency
     """
     print("=" * 70)
     print("HNG STAGE 3 - ALERT WATCHER v2.0")
     print("=" * 70)
+    print(f"[CONFIG] Runtime: {sys.implementation.name} {sys.version.split()[0]}")
     print(f"[CONFIG] Log File: {filepath}")
     print(f"[CONFIG] Error Rate Threshold: {ERROR_RATE_THRESHOLD}%")
     print(f"[CONFIG] Window Size: {WINDOW_SIZE} requests")
     print(f"[CONFIG] Alert Cooldown: {ALERT_COOLDOWN_SEC} seconds")
     print(f"[CONFIG] Maintenance Mode: {MAINTENANCE_MODE}")
+    print(f"[CONFIG] Log Level: {LOG_LEVEL}")
+    print(f"[CONFIG] Verbose: {VERBOSE}")
     print(f"[CONFIG] Expected Primary Pool: {EXPECTED_PRIMARY_POOL}")
     print(f"[CONFIG] Expected Backup Pool: {EXPECTED_BACKUP_POOL}")
     print(f"[CONFIG] Slack Webhook: {SLACK_WEBHOOK_URL[:50] if SLACK_WEBHOOK_URL else 'NOT SET'}...")
     print("=" * 70)
     
     # Wait for log file
-    wait_count = 0
-    while not os.path.exists(filepath):
-        wait_count += 1
-        print(f"[WAITING] Log file not found: {filepath} (attempt {wait_count})")
-        time.sleep(2)
-        if wait_count > 30:
-            print("[ERROR] Log file did not appear after 60 seconds!")
-            exit(1)
+    if not wait_for_log_file(filepath):
+        print(f"[ERROR] Log file did not appear after {LOG_WAIT_TIMEOUT_SEC} seconds!")
+        sys.exit(1)
     
     print(f"[READY] Log file found!")
     print("[READY] Starting real-time monitoring...")
     print("=" * 70)
     
     # Send startup alert
-    startup_message = (
-        f"*🟢 Alert Watcher Started*\n\n"
-        f"*Configuration:*\n"
-        f"• Monitoring: `{filepath}`\n"
-        f"• Error Threshold: `{ERROR_RATE_THRESHOLD}%`\n"
-        f"• Window Size: `{WINDOW_SIZE}` requests\n"
-        f"• Cooldown: `{ALERT_COOLDOWN_SEC}s`\n"
-        f"• Primary Pool: `{EXPECTED_PRIMARY_POOL.upper()}`\n"
-        f"• Backup Pool: `{EXPECTED_BACKUP_POOL.upper()}`\n\n"
-        f"*Status:* Monitoring active and ready to detect failovers"
+    send_slack_alert(
+        STARTUP_TMPL, alert_type='info', emoji='🟢',
+        filepath=filepath, threshold=ERROR_RATE_THRESHOLD,
+        window_size=WINDOW_SIZE, cooldown=ALERT_COOLDOWN_SEC,
+        primary_upper=_PRIMARY_UPPER,
+        backup_upper=_BACKUP_UPPER
     )
-    send_slack_alert(startup_message, alert_type='info', emoji='🟢')
     
-    print("[MONITORING] Using 'tail -F -n 0' to follow logs...")
+    if INotify is not None:
+        print("[MONITORING] Using inotify to follow logs...")
+    else:
+        print(f"[MONITORING] inotify unavailable, polling every {POLL_INTERVAL_SEC}s...")
     print("[MONITORING] Waiting for new log entries...")
     print("=" * 70)
     
-    # Use subprocess to tail (works with Docker volumes)
-    # -F: follow and retry if file is rotated
-    # -n 0: start from end (only new lines)
-    process = subprocess.Popen(
-        ['tail', '-F', '-n', '0', filepath],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1
-    )
-    
     line_count = 0
     try:
-        for line in process.stdout:
-            if line:
+        for line in follow_log_file(filepath):
+            if VERBOSE:
                 line_count += 1
                 if line_count % 10 == 0:
                     print(f"[INFO] Processed {line_count} log entries...")
-                
-                entry = parse_log_line(line)
-                if entry:
-                    process_log_entry(entry)
-                else:
-                    print(f"[DEBUG] Failed to parse log line: {line[:100]}")
+            
+            entry = parse_log_line(line)
+            if entry:
+                process_log_entry(entry)
+            else:
+                logger.debug("Failed to parse log line: %r", line[:100])
     except KeyboardInterrupt:
         print("\n[SHUTDOWN] Stopping watcher...")
-        process.terminate()
     except Exception as e:
         print(f"[ERROR] Unexpected error in tail loop: {e}")
-        import traceback
         traceback.print_exc()
-        process.terminate()
         raise
 
 def main():
@@ -320,23 +612,31 @@ def main():
     print("=" * 70 + "\n")
     
     if not SLACK_WEBHOOK_URL:
-        print("[FATAL ERROR] SLACK_WEBHOOK_URL environment variable not set!")
-        print("[FATAL ERROR] Cannot send alerts. Exiting.")
-        exit(1)
+        # Nothing queued or started yet: skip interpreter teardown entirely
+        sys.stderr.write("[FATAL ERROR] SLACK_WEBHOOK_URL environment variable not set!\n")
+        sys.stderr.write("[FATAL ERROR] Cannot send alerts. Exiting.\n")
+        sys.stderr.flush()
+        os._exit(1)
     
     print(f"[INIT] Slack webhook configured: {SLACK_WEBHOOK_URL[:50]}...")
     print(f"[INIT] Starting monitoring system...\n")
+    start_alert_sender()
+    signal.signal(signal.SIGTERM, handle_sigterm)
     
     try:
-        tail_log_file_with_subprocess(LOG_FILE)
+        tail_log_file(LOG_FILE)
     except KeyboardInterrupt:
         print("\n[SHUTDOWN] Watcher stopped by user (Ctrl+C)")
-        exit(0)
+        sys.exit(0)
     except Exception as e:
         print(f"[FATAL ERROR] Watcher crashed: {e}")
-        import traceback
         traceback.print_exc()
-        exit(1)
+        sys.exit(1)
+    finally:
+        # Deliver in-flight alerts before the orchestrator stops the container
+        print("\n[SHUTDOWN] Flushing queued alerts...")
+        if not flush_alert_queue():
+            print("[SHUTDOWN] Timed out with alerts still queued")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file